@@ -4,10 +4,29 @@ Resizes images to compatible resolutions for models that require specific dimens
 """
 
 import torch
+import torch.nn.functional as F
 import numpy as np
 from PIL import Image
-import math
-import cv2
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Resampling methods torch can run natively on batched GPU tensors. CPU images,
+# and lanczos, hamming and box (no torch equivalent), resize per image with PIL.
+TORCH_INTERPOLATION_MODES = {
+    "bicubic": "bicubic",
+    "bilinear": "bilinear",
+    "nearest": "nearest-exact",  # pixel-center rounding like PIL, may differ at exact half-pixels
+}
+
+# PIL resampling filter for each method name
+PIL_RESAMPLING_METHODS = {
+    "lanczos": Image.Resampling.LANCZOS,
+    "bicubic": Image.Resampling.BICUBIC,
+    "hamming": Image.Resampling.HAMMING,
+    "bilinear": Image.Resampling.BILINEAR,
+    "box": Image.Resampling.BOX,
+    "nearest": Image.Resampling.NEAREST,
+}
 
 class ImageResolutionFixer:
     """
@@ -40,19 +59,11 @@ class ImageResolutionFixer:
     
     def get_resampling_method(self, method_name):
         """Convert method name to PIL resampling filter"""
-        method_map = {
-            "lanczos": Image.Resampling.LANCZOS,
-            "bicubic": Image.Resampling.BICUBIC,
-            "hamming": Image.Resampling.HAMMING,
-            "bilinear": Image.Resampling.BILINEAR,
-            "box": Image.Resampling.BOX,
-            "nearest": Image.Resampling.NEAREST,
-        }
-        return method_map.get(method_name, Image.Resampling.LANCZOS)
+        return PIL_RESAMPLING_METHODS.get(method_name, Image.Resampling.LANCZOS)
     
     def round_to_multiple(self, value, multiple):
-        """Round a value to the nearest multiple"""
-        return int(math.ceil(value / multiple) * multiple)
+        """Round a value up to the nearest multiple"""
+        return (value + multiple - 1) // multiple * multiple
     
     def calculate_target_dimensions(self, orig_width, orig_height, round_multiple):
         """Calculate target dimensions by rounding to nearest multiple"""
@@ -60,9 +71,29 @@ class ImageResolutionFixer:
         new_height = self.round_to_multiple(orig_height, round_multiple)
         return new_width, new_height
     
-    def resize_letterbox(self, pil_image, target_width, target_height, resampling):
+    def to_pil(self, img_np):
+        """Wrap a contiguous uint8 [height, width, channels] array as a PIL image"""
+        height, width, channels = img_np.shape
+        if channels == 3:
+            # frombuffer with an explicit mode skips fromarray's dtype/shape mode detection
+            return Image.frombuffer("RGB", (width, height), img_np, "raw", "RGB", 0, 1)
+        # Other layouts (RGBA, single-channel) let PIL pick the mode
+        return Image.fromarray(img_np[..., 0] if channels == 1 else img_np)
+    
+    def resize_array(self, img_np, width, height, resampling):
+        """Resize a uint8 [height, width, channels] array, returning a uint8 array"""
+        resized = np.asarray(self.to_pil(img_np).resize((width, height), resampling))
+        # Single-channel images come back from PIL without the channel axis
+        return resized.reshape(height, width, -1)
+    
+    def to_float(self, img_np, out_np):
+        """Convert a uint8 array to float in [0, 1], writing into out_np"""
+        # One-pass cast+scale into the output; from_numpy would warn on PIL's read-only array
+        np.divide(img_np, np.float32(255.0), out=out_np)
+    
+    def resize_letterbox(self, img_np, target_width, target_height, resampling, out_np):
         """Resize with letterboxing (maintain aspect ratio, add padding)"""
-        orig_width, orig_height = pil_image.size
+        orig_height, orig_width = img_np.shape[:2]
         
         # Calculate scaling to fit within target dimensions
         scale = min(target_width / orig_width, target_height / orig_height)
@@ -70,29 +101,28 @@ class ImageResolutionFixer:
         new_height = int(orig_height * scale)
         
         # Resize image
-        resized = pil_image.resize((new_width, new_height), resampling)
+        resized = self.resize_array(img_np, new_width, new_height, resampling)
         
-        # Create new image with target dimensions (black background)
-        result = Image.new('RGB', (target_width, target_height), (0, 0, 0))
+        # Black background
+        out_np.fill(0.0)
         
         # Paste resized image centered
         paste_x = (target_width - new_width) // 2
         paste_y = (target_height - new_height) // 2
-        result.paste(resized, (paste_x, paste_y))
-        
-        return result
+        self.to_float(resized, out_np[paste_y:paste_y + new_height, paste_x:paste_x + new_width])
     
-    def resize_crop(self, pil_image, target_width, target_height, resampling):
+    def resize_crop(self, img_np, target_width, target_height, resampling, out_np):
         """Resize with center crop (fill target, crop excess)"""
-        orig_width, orig_height = pil_image.size
+        orig_height, orig_width = img_np.shape[:2]
         
         # Calculate scaling to cover target dimensions
         scale = max(target_width / orig_width, target_height / orig_height)
-        new_width = int(orig_width * scale)
-        new_height = int(orig_height * scale)
+        # Float rounding can land one pixel short of the target (47 * (48/47) -> 47)
+        new_width = max(int(orig_width * scale), target_width)
+        new_height = max(int(orig_height * scale), target_height)
         
         # Resize image
-        resized = pil_image.resize((new_width, new_height), resampling)
+        resized = self.resize_array(img_np, new_width, new_height, resampling)
         
         # Calculate crop coordinates (center crop)
         left = (new_width - target_width) // 2
@@ -100,32 +130,53 @@ class ImageResolutionFixer:
         right = left + target_width
         bottom = top + target_height
         
-        return resized.crop((left, top, right, bottom))
+        self.to_float(resized[top:bottom, left:right], out_np)
     
-    def resize_fill(self, pil_image, target_width, target_height, resampling):
+    def resize_fill(self, img_np, target_width, target_height, resampling, out_np):
         """Resize to fill (stretch to fit, may distort aspect ratio)"""
-        return pil_image.resize((target_width, target_height), resampling)
+        resized = self.resize_array(img_np, target_width, target_height, resampling)
+        self.to_float(resized, out_np)
     
-    def resize_smart_fill(self, pil_image, target_width, target_height, resampling):
+    def reflect_fill(self, arr, before, after):
+        """
+        Mirror the content of arr along its first axis into the `before` and
+        `after` rows around it, in place (BORDER_REFLECT_101).
         """
-        Resize with smart fill using OpenCV Border Reflection.
+        size = arr.shape[0] - before - after
+        if size == 1:
+            arr[:before] = arr[before]
+            arr[before + 1:] = arr[before]
+            return
+        
+        # Reflect at most size - 1 rows at a time so every step mirrors around
+        # a row that is also a mirror axis of the original content
+        start, stop = before, before + size
+        while start > 0:
+            n = min(start, size - 1)
+            arr[start - n:start] = arr[start + 1:start + 1 + n][::-1]
+            start -= n
+        while stop < arr.shape[0]:
+            n = min(arr.shape[0] - stop, size - 1)
+            arr[stop:stop + n] = arr[stop - 1 - n:stop - 1][::-1]
+            stop += n
+    
+    def resize_smart_fill(self, img_np, target_width, target_height, resampling, out_np):
+        """
+        Resize with smart fill using Border Reflection.
         Instead of stretching pixels (which causes smearing), this mirrors the 
         image content at the edges. This is fast, algorithmic, and looks natural.
+        Writes straight into the float out_np, so no padded copy is built.
         """
-        orig_width, orig_height = pil_image.size
+        orig_height, orig_width = img_np.shape[:2]
         
         # 1. Resize the image first to fit within the target bounds while maintaining aspect ratio
         scale = min(target_width / orig_width, target_height / orig_height)
         new_width = int(orig_width * scale)
         new_height = int(orig_height * scale)
         
-        resized_pil = pil_image.resize((new_width, new_height), resampling)
-        
-        # 2. Convert to NumPy for OpenCV operations
-        # PIL (RGB) -> NumPy (RGB)
-        img_np = np.array(resized_pil)
+        resized = self.resize_array(img_np, new_width, new_height, resampling)
         
-        # 3. Calculate padding requirements
+        # 2. Calculate padding requirements
         pad_w = target_width - new_width
         pad_h = target_height - new_height
         
@@ -135,67 +186,193 @@ class ImageResolutionFixer:
         left = pad_w // 2
         right = pad_w - left
         
-        # 4. Apply Border Reflection
+        # 3. Convert the resized image to float directly into the center of the output
+        self.to_float(resized, out_np[top:top + new_height, left:left + new_width])
+        
+        # 4. Apply Border Reflection in place, columns first, then full rows
         # BORDER_REFLECT_101 mirrors pixels: gfedcb|abcdefgh|gfedcba
         # This avoids repeating the edge pixel itself and creates a smooth texture transition
-        result_np = cv2.copyMakeBorder(
-            img_np, 
-            top, bottom, left, right, 
-            cv2.BORDER_REFLECT_101
-        )
+        self.reflect_fill(out_np[top:top + new_height].swapaxes(0, 1), left, right)
+        self.reflect_fill(out_np, top, bottom)
+    
+    def interpolate(self, x, width, height, mode):
+        """Resize a batched NCHW tensor, close to (not identical with) PIL's filters"""
+        # antialias selects torch's PIL-style bilinear/bicubic kernels
+        antialias = mode in ("bilinear", "bicubic")
+        # The antialiased CPU kernels have no half-precision version, resize in float32
+        dtype = x.dtype
+        if dtype in (torch.float16, torch.bfloat16):
+            x = x.float()
+        resized = F.interpolate(x, size=(height, width), mode=mode, antialias=antialias)
+        if mode == "bicubic":
+            # Bicubic overshoots at hard edges; keep the result in range. PIL also
+            # clips between its two passes, so hard edges can still differ from it
+            resized = resized.clamp_(0.0, 1.0)
+        return resized.to(dtype)
+    
+    def resize_letterbox_tensor(self, x, target_width, target_height, mode):
+        """Tensor version of resize_letterbox"""
+        orig_height, orig_width = x.shape[-2:]
         
-        # 5. Convert back to PIL
-        return Image.fromarray(result_np)
+        scale = min(target_width / orig_width, target_height / orig_height)
+        new_width = int(orig_width * scale)
+        new_height = int(orig_height * scale)
+        
+        resized = self.interpolate(x, new_width, new_height, mode)
+        
+        # Pad with black, keeping the resized image centered
+        left = (target_width - new_width) // 2
+        top = (target_height - new_height) // 2
+        right = target_width - new_width - left
+        bottom = target_height - new_height - top
+        return F.pad(resized, (left, right, top, bottom), value=0.0)
     
+    def resize_crop_tensor(self, x, target_width, target_height, mode):
+        """Tensor version of resize_crop"""
+        orig_height, orig_width = x.shape[-2:]
+        
+        scale = max(target_width / orig_width, target_height / orig_height)
+        # Float rounding can land one pixel short of the target (47 * (48/47) -> 47)
+        new_width = max(int(orig_width * scale), target_width)
+        new_height = max(int(orig_height * scale), target_height)
+        
+        resized = self.interpolate(x, new_width, new_height, mode)
+        
+        left = (new_width - target_width) // 2
+        top = (new_height - target_height) // 2
+        return resized[..., top:top + target_height, left:left + target_width]
+    
+    def resize_fill_tensor(self, x, target_width, target_height, mode):
+        """Tensor version of resize_fill, one interpolate call for the whole batch"""
+        return self.interpolate(x, target_width, target_height, mode)
+    
+    def reflect_indices(self, size, before, after, device):
+        """Source index of every padded position under BORDER_REFLECT_101"""
+        index = torch.arange(-before, size + after, device=device)
+        if size == 1:
+            return index.zero_()
+        period = 2 * (size - 1)
+        index = index.remainder(period)
+        return torch.where(index >= size, period - index, index)
+    
+    def resize_smart_fill_tensor(self, x, target_width, target_height, mode):
+        """Tensor version of resize_smart_fill"""
+        orig_height, orig_width = x.shape[-2:]
+        
+        scale = min(target_width / orig_width, target_height / orig_height)
+        new_width = int(orig_width * scale)
+        new_height = int(orig_height * scale)
+        
+        resized = self.interpolate(x, new_width, new_height, mode)
+        
+        pad_w = target_width - new_width
+        pad_h = target_height - new_height
+        top = pad_h // 2
+        bottom = pad_h - top
+        left = pad_w // 2
+        right = pad_w - left
+        
+        # F.pad's reflect mode is BORDER_REFLECT_101 (gfedcb|abcdefgh|gfedcba),
+        # but it needs every pad to be smaller than the image side
+        if max(left, right) < new_width and max(top, bottom) < new_height:
+            return F.pad(resized, (left, right, top, bottom), mode="reflect")
+        
+        # Very thin images need the reflection repeated, gather it by index
+        cols = self.reflect_indices(new_width, left, right, x.device)
+        rows = self.reflect_indices(new_height, top, bottom, x.device)
+        return resized.index_select(-1, cols).index_select(-2, rows)
+    
+    def resize_image_tensor(self, image, fit, method, target_width, target_height):
+        """
+        Resize the whole batch at once with torch, on the image's own device.
+        Avoids the per-image round-trip through NumPy and PIL.
+        """
+        mode = TORCH_INTERPOLATION_MODES[method]
+        
+        # ComfyUI images are [batch, height, width, channels], torch wants NCHW.
+        # Viewed as channels_last this needs no copy, and interpolate and pad
+        # keep that layout, so the final permute back is free as well.
+        x = image.permute(0, 3, 1, 2).contiguous(memory_format=torch.channels_last)
+        
+        if fit == "letterbox":
+            x = self.resize_letterbox_tensor(x, target_width, target_height, mode)
+        elif fit == "crop":
+            x = self.resize_crop_tensor(x, target_width, target_height, mode)
+        elif fit == "fill":
+            x = self.resize_fill_tensor(x, target_width, target_height, mode)
+        elif fit == "smart_fill":
+            x = self.resize_smart_fill_tensor(x, target_width, target_height, mode)
+        
+        return x.permute(0, 2, 3, 1).contiguous()
+    
+    def process_image(self, img_np, out_np, fit, target_width, target_height, resampling):
+        """Resize a single uint8 [height, width, channels] image on the CPU into out_np"""
+        # Apply resize based on fit mode
+        if fit == "letterbox":
+            self.resize_letterbox(img_np, target_width, target_height, resampling, out_np)
+        elif fit == "crop":
+            self.resize_crop(img_np, target_width, target_height, resampling, out_np)
+        elif fit == "fill":
+            self.resize_fill(img_np, target_width, target_height, resampling, out_np)
+        elif fit == "smart_fill":
+            self.resize_smart_fill(img_np, target_width, target_height, resampling, out_np)
+    
+    @torch.inference_mode()
     def resize_image(self, image, fit, method, round_to_multiple):
-        """Main function to resize image with specified parameters"""
+        """
+        Main function to resize image with specified parameters.
+        The output has the same dtype and device as the input on every path.
+        """
         
-        # Convert ComfyUI image tensor to PIL Image
         # ComfyUI images are in format: [batch, height, width, channels]
-        batch_size = image.shape[0]
-        results = []
-        
-        for i in range(batch_size):
-            # Get single image from batch
-            img_tensor = image[i]
-            
-            # Convert to numpy and then PIL
-            img_np = (img_tensor.cpu().numpy() * 255).astype(np.uint8)
-            pil_image = Image.fromarray(img_np)
-            
-            orig_width, orig_height = pil_image.size
-            
-            # Calculate target dimensions (just round to nearest multiple)
-            target_width, target_height = self.calculate_target_dimensions(
-                orig_width, orig_height, round_to_multiple
-            )
-            
-            # Get resampling method
-            resampling = self.get_resampling_method(method)
-            
-            # Apply resize based on fit mode
-            if fit == "letterbox":
-                result_image = self.resize_letterbox(pil_image, target_width, target_height, resampling)
-            elif fit == "crop":
-                result_image = self.resize_crop(pil_image, target_width, target_height, resampling)
-            elif fit == "fill":
-                result_image = self.resize_fill(pil_image, target_width, target_height, resampling)
-            elif fit == "smart_fill":
-                result_image = self.resize_smart_fill(pil_image, target_width, target_height, resampling)
-            
-            # Convert back to tensor
-            result_np = np.array(result_image).astype(np.float32) / 255.0
-            result_tensor = torch.from_numpy(result_np)
-            results.append(result_tensor)
-        
-        # Stack batch back together
-        output_tensor = torch.stack(results, dim=0)
+        batch_size, orig_height, orig_width, channels = image.shape
         
-        # Return image tensor and final dimensions
-        final_width = target_width
-        final_height = target_height
+        # Every image in the batch shares its size, so this is computed once
+        target_width, target_height = self.calculate_target_dimensions(
+            orig_width, orig_height, round_to_multiple
+        )
+        
+        # Already a compatible size: every fit mode would return the input as is
+        if (target_width, target_height) == (orig_width, orig_height):
+            return (image, target_width, target_height)
         
-        return (output_tensor, final_width, final_height)
+        # GPU batches skip PIL entirely for the methods torch supports. On the
+        # CPU, Pillow's resamplers are as fast or faster, so they are kept there.
+        if image.is_cuda and method in TORCH_INTERPOLATION_MODES:
+            output_tensor = self.resize_image_tensor(image, fit, method, target_width, target_height)
+            return (output_tensor, target_width, target_height)
+        
+        resampling = self.get_resampling_method(method)
+        
+        # Convert the whole batch to uint8 at once, on the tensor's own device so
+        # only 1 byte per pixel is copied to the CPU (contiguous, as PIL wraps
+        # each image's buffer directly)
+        images_np = np.ascontiguousarray(image.mul(255).clamp_(0, 255).to(torch.uint8).cpu().numpy())
+        
+        # Results are written in place, so there is no list to stack afterwards
+        output_tensor = torch.empty((batch_size, target_height, target_width, channels), dtype=torch.float32)
+        output_np = output_tensor.numpy()
+        
+        def process(i):
+            self.process_image(images_np[i], output_np[i], fit, target_width, target_height, resampling)
+        
+        if batch_size == 1:
+            # The common single-image case runs inline, no pool to start up
+            process(0)
+        else:
+            # PIL resizing and NumPy copies release the GIL, so threads scale
+            # across cores without the pickling cost of worker processes
+            max_workers = min(batch_size, os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # list() waits for every worker and re-raises their errors
+                list(executor.map(process, range(batch_size)))
+        
+        # Like the torch path, hand back the input's dtype and device (no-op for
+        # the usual CPU float32 images)
+        output_tensor = output_tensor.to(device=image.device, dtype=image.dtype)
+        
+        # Return image tensor and final dimensions
+        return (output_tensor, target_width, target_height)
 
 
 # Node class mappings for ComfyUI
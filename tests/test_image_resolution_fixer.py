@@ -0,0 +1,88 @@
+import importlib.util
+import os
+
+import numpy as np
+import torch
+
+MODULE_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "image_resolution_fixer.py")
+spec = importlib.util.spec_from_file_location("image_resolution_fixer", MODULE_PATH)
+image_resolution_fixer = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(image_resolution_fixer)
+
+
+def test_crop_output_matches_reported_size():
+    # 47 * (48 / 47) rounds down to 47, one pixel short of the crop target
+    node = image_resolution_fixer.ImageResolutionFixer()
+    for method in ["lanczos", "bicubic", "hamming", "bilinear", "box", "nearest"]:
+        output, width, height = node.resize_image(torch.rand(1, 32, 47, 3), "crop", method, 16)
+        assert (width, height) == (48, 32)
+        assert output.shape == (1, 32, 48, 3)
+        # A one-pixel-short crop used to broadcast a single column across the output
+        assert not torch.equal(output[:, :, 0], output[:, :, -1])
+
+
+def test_crop_tensor_output_matches_target_size():
+    # Same rounding case on the torch path, which only GPU images reach through resize_image
+    node = image_resolution_fixer.ImageResolutionFixer()
+    for method in ["bicubic", "bilinear", "nearest"]:
+        output = node.resize_image_tensor(torch.rand(1, 32, 47, 3), "crop", method, 48, 32)
+        assert output.shape == (1, 32, 48, 3)
+
+
+def test_smart_fill_matches_numpy_reflect_padding():
+    # Includes pads longer than the image side and single-row/column content
+    node = image_resolution_fixer.ImageResolutionFixer()
+    resampling = node.get_resampling_method("lanczos")
+    rng = np.random.default_rng(0)
+    for orig_height, orig_width, multiple in [(1, 300, 512), (3, 200, 512), (200, 3, 512), (5, 7, 16), (31, 45, 16)]:
+        img_np = rng.integers(0, 256, (orig_height, orig_width, 3), dtype=np.uint8)
+        target_width, target_height = node.calculate_target_dimensions(orig_width, orig_height, multiple)
+        out_np = np.empty((target_height, target_width, 3), dtype=np.float32)
+        node.resize_smart_fill(img_np, target_width, target_height, resampling, out_np)
+        
+        scale = min(target_width / orig_width, target_height / orig_height)
+        new_width, new_height = int(orig_width * scale), int(orig_height * scale)
+        resized = node.resize_array(img_np, new_width, new_height, resampling)
+        top, left = (target_height - new_height) // 2, (target_width - new_width) // 2
+        pad = ((top, target_height - new_height - top), (left, target_width - new_width - left), (0, 0))
+        expected = np.pad(resized, pad, mode="reflect").astype(np.float32) / np.float32(255.0)
+        np.testing.assert_array_equal(out_np, expected)
+
+
+def test_smart_fill_tensor_matches_numpy_reflect_padding():
+    # 1x5 and 3x1 need pads longer than the resized side, 31x45 takes F.pad's reflect mode
+    node = image_resolution_fixer.ImageResolutionFixer()
+    for orig_height, orig_width in [(1, 5), (3, 1), (31, 45)]:
+        x = torch.rand(2, 3, orig_height, orig_width)
+        target_width, target_height = node.calculate_target_dimensions(orig_width, orig_height, 16)
+        output = node.resize_smart_fill_tensor(x, target_width, target_height, "nearest-exact")
+        
+        scale = min(target_width / orig_width, target_height / orig_height)
+        new_width, new_height = int(orig_width * scale), int(orig_height * scale)
+        resized = node.interpolate(x, new_width, new_height, "nearest-exact").numpy()
+        top, left = (target_height - new_height) // 2, (target_width - new_width) // 2
+        pad = ((0, 0), (0, 0), (top, target_height - new_height - top), (left, target_width - new_width - left))
+        np.testing.assert_array_equal(output.numpy(), np.pad(resized, pad, mode="reflect"))
+
+
+def test_batch_matches_images_processed_alone():
+    # Batches above one go through the thread pool, each slot must hold its own image
+    node = image_resolution_fixer.ImageResolutionFixer()
+    images = torch.rand(5, 31, 45, 3)
+    for fit in ["smart_fill", "letterbox", "crop", "fill"]:
+        for method in ["lanczos", "bilinear"]:
+            output, _, _ = node.resize_image(images, fit, method, 16)
+            for i in range(images.shape[0]):
+                alone, _, _ = node.resize_image(images[i:i + 1], fit, method, 16)
+                assert torch.equal(output[i:i + 1], alone)
+
+
+def test_compliant_input_is_returned_unchanged():
+    # Already a multiple of 16: the input itself comes back, not a uint8-quantized copy
+    node = image_resolution_fixer.ImageResolutionFixer()
+    image = torch.rand(2, 32, 48, 3)
+    for fit in ["smart_fill", "letterbox", "crop", "fill"]:
+        for method in ["lanczos", "bicubic", "hamming", "bilinear", "box", "nearest"]:
+            output, width, height = node.resize_image(image, fit, method, 16)
+            assert output is image
+            assert (width, height) == (48, 32)